@@ -1,14 +1,31 @@
 # analysis_service.py - Standalone Python Flask service
 import os
 import json
+import hashlib
+import re
 import time
+import threading
+import atexit
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from flask import Flask, request, jsonify
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still atomic, just not serialized
+    fcntl = None
+from functools import lru_cache
+import numpy as np
+import orjson
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import google.generativeai as genai
+from google.generativeai.client import get_default_generative_client
+from google.api_core import exceptions as google_exceptions
 
 # Load environment variables from parent directory .env file
 from dotenv import load_dotenv
@@ -32,19 +49,384 @@ class ContentItem:
     post_type: str
     engagement: Optional[Dict] = None
 
-@dataclass
+# Numeric score per RiskLevel value
+_RISK_SCORES = {
+    RiskLevel.LOW.value: 0.1,
+    RiskLevel.MODERATE.value: 0.4,
+    RiskLevel.HIGH.value: 0.7,
+    RiskLevel.CRITICAL.value: 1.0
+}
+
+_HIGH_RISK = frozenset({RiskLevel.HIGH.value, RiskLevel.CRITICAL.value})
+
+@dataclass(slots=True)
 class AnalysisResult:
     content_id: str
-    risk_level: RiskLevel
+    risk_level: str  # a RiskLevel value, kept as a plain string for report building
     categories: List[str]
     confidence_score: float
     reasoning: str
     red_flags: List[str]
+    risk_score: float = field(init=False)
+
+    def __post_init__(self):
+        self.risk_score = _RISK_SCORES.get(self.risk_level, 0.1)
+
+# Schema-constrained JSON output needs a model with response_schema support (Gemini 2.x Flash or later)
+MODEL_VERSION = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+
+# Fixed instructions shared by every analysis request; only the content block varies
+_ANALYSIS_RUBRIC = """Analyze the social media content below for workplace-relevant behavioral concerns.
+
+Evaluate for these categories:
+1. Personal attacks on individuals
+2. Harassment patterns
+3. Hate speech toward groups
+4. Spreading disinformation
+5. Excessive negativity
+
+Consider context, sarcasm, cultural communication styles, and whether this is a response to provocation.
+
+Respond in JSON format:
+{
+    "risk_level": "low|moderate|high|critical",
+    "categories": ["list of applicable categories"],
+    "confidence_score": 0.0-1.0,
+    "reasoning": "detailed explanation",
+    "red_flags": ["specific concerning elements"],
+    "context_notes": "context considered"
+}
+"""
+
+_MS_TO_SECONDS = 0.001
+
+# Fields Gemini must return for each analysed post
+_ANALYSIS_PROPERTIES = {
+    'risk_level': {'type': 'string', 'format': 'enum', 'enum': [level.value for level in RiskLevel]},
+    'categories': {'type': 'array', 'items': {'type': 'string'}},
+    'confidence_score': {'type': 'number'},
+    'reasoning': {'type': 'string'},
+    'red_flags': {'type': 'array', 'items': {'type': 'string'}},
+    'context_notes': {'type': 'string'}
+}
+_ANALYSIS_REQUIRED = ['risk_level', 'categories', 'confidence_score', 'reasoning', 'red_flags']
+
+_ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': _ANALYSIS_PROPERTIES,
+    'required': _ANALYSIS_REQUIRED
+}
+_BATCH_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'results': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {'id': {'type': 'integer'}, **_ANALYSIS_PROPERTIES},
+                'required': ['id'] + _ANALYSIS_REQUIRED
+            }
+        }
+    },
+    'required': ['results']
+}
+
+# Constrained decoding: Gemini emits schema-valid JSON, parsed without any scanning
+_ANALYSIS_CONFIG = genai.GenerationConfig(response_mime_type='application/json', response_schema=_ANALYSIS_SCHEMA)
+_BATCH_CONFIG = genai.GenerationConfig(response_mime_type='application/json', response_schema=_BATCH_SCHEMA)
+
+# Keyword lists for the offline fallback, in the order their categories are reported
+_FALLBACK_KEYWORDS = {
+    'personal_attacks': ['idiot', 'stupid', 'moron', 'loser', 'pathetic'],
+    'hate_speech': ['hate', 'disgusting', 'should die', 'kill yourself']
+}
+
+# Per-post section filled in for each request after the rubric
+_CONTENT_TEMPLATE = """
+Content: "{text}"
+Platform: {platform}
+Post Type: {post_type}
+Engagement: {engagement}
+"""
+
+# Appended after the rubric when several posts share one request
+_BATCH_INSTRUCTIONS = """
+The {count} posts below are numbered [1] to [{count}]. Analyze each one independently.
+Respond with a single JSON object of the form {{"results": [{{"id": 1, ...}}, {{"id": 2, ...}}]}},
+where each entry has the "id" of its post plus every field of the format above.
+Return exactly one entry per post.
+"""
+
+class RateLimiter:
+    """Thread-safe token bucket pacing calls to a requests-per-minute quota"""
+
+    def __init__(self, requests_per_minute: float):
+        self.max_request_capacity = max(1.0, float(requests_per_minute))
+        self.refill_per_second = self.max_request_capacity / 60.0
+        self.available_request_capacity = self.max_request_capacity
+        self.last_update_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one request worth of capacity is available, then consume it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.last_update_time
+                self.available_request_capacity = min(
+                    self.max_request_capacity,
+                    self.available_request_capacity + elapsed * self.refill_per_second
+                )
+                self.last_update_time = now
+
+                if self.available_request_capacity >= 1:
+                    self.available_request_capacity -= 1
+                    return
+
+                wait_seconds = (1 - self.available_request_capacity) / self.refill_per_second
+
+            time.sleep(wait_seconds)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class LLMCache:
+    """Thread-safe in-process LRU cache for Gemini analyses with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 86400):
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content: 'ContentItem') -> str:
+        """Deterministic key over the model and every prompt input"""
+        payload = json.dumps({
+            'm': MODEL_VERSION,
+            't': content.text,
+            'p': content.platform,
+            'pt': content.post_type,
+            'e': content.engagement
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0
+            }
+
+class SemanticCache:
+    """Cosine-similarity cache returning stored analyses for near-duplicate posts"""
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 5000, path: Optional[str] = None):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.path = path
+        self._matrix = None  # unit-normalised embeddings, allocated on first insert
+        self._results: List[Optional[AnalysisResult]] = [None] * self.max_entries
+        self._size = 0
+        self._next_slot = 0
+        self._added_since_load = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def _normalise(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding) -> Optional[AnalysisResult]:
+        """Return the closest stored analysis if it clears the similarity threshold"""
+        query = self._normalise(embedding)
+        with self._lock:
+            if self._size == 0 or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            similarities = self._matrix[:self._size] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._results[best]
+
+    def add(self, embedding, result: AnalysisResult):
+        vector = self._normalise(embedding)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            elif self._matrix.shape[1] != vector.shape[0]:
+                return
+            # Ring buffer: once full, overwrite the oldest entry
+            self._matrix[self._next_slot] = vector
+            self._results[self._next_slot] = result
+            self._next_slot = (self._next_slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+            self._added_since_load += 1
+
+    def save(self):
+        """Merge entries added since load into self.path.
+
+        Every gunicorn worker saves to the same file at exit, so each one appends
+        only its own new entries to what is on disk, under an exclusive lock, and
+        swaps the file in atomically so a killed writer never leaves it truncated.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            new_count = min(self._added_since_load, self._size)
+            if new_count == 0:
+                return
+            # Oldest first, so a reload evicts in the same order
+            order = [(self._next_slot - new_count + i) % self.max_entries for i in range(new_count)]
+            embeddings = self._matrix[order]
+            results = [
+                {
+                    'risk_level': r.risk_level,
+                    'categories': r.categories,
+                    'confidence_score': r.confidence_score,
+                    'reasoning': r.reasoning,
+                    'red_flags': r.red_flags
+                } for r in (self._results[slot] for slot in order)
+            ]
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with open(self.path + '.lock', 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            existing = self._read() if os.path.exists(self.path) else None
+            if existing is not None and existing[0].shape[1:] == embeddings.shape[1:]:
+                embeddings = np.concatenate([existing[0], embeddings])[-self.max_entries:]
+                results = (existing[1] + results)[-self.max_entries:]
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, embeddings=embeddings, results=np.array(json.dumps(results)))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        # Entries added while the file was being written stay pending for the next save
+        with self._lock:
+            self._added_since_load -= new_count
+
+    def _read(self) -> Optional[Tuple[np.ndarray, List[Dict]]]:
+        try:
+            with np.load(self.path) as data:
+                return data['embeddings'], json.loads(str(data['results']))
+        except Exception as e:
+            print(f"Warning: Failed to load semantic cache from {self.path}: {e}")
+            return None
+
+    def load(self):
+        """Restore embeddings and analyses previously written by save()"""
+        stored = self._read()
+        if stored is None:
+            return
+        embeddings, results = stored[0][-self.max_entries:], stored[1][-self.max_entries:]
+
+        for embedding, item in zip(embeddings, results):
+            self.add(embedding, AnalysisResult(
+                content_id='',
+                risk_level=item['risk_level'],
+                categories=item['categories'],
+                confidence_score=item['confidence_score'],
+                reasoning=item['reasoning'],
+                red_flags=item['red_flags']
+            ))
+        self._added_since_load = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0
+            }
 
 class SocialMediaAnalyzer:
-    def __init__(self, gemini_api_key: str):
-        genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+    def __init__(self, gemini_api_key: str, gemini_concurrency: Optional[int] = None):
+        genai.configure(api_key=gemini_api_key, transport=os.getenv('GEMINI_TRANSPORT', 'grpc'))
+        self.model = genai.GenerativeModel(MODEL_VERSION)
+        # generate_content and embed_content share one lazily built client (and
+        # channel); build it now so pool threads can't race to create duplicates
+        get_default_generative_client()
+
+        # Gemini tolerates only a few in-flight requests per key, keep this low
+        if gemini_concurrency is None:
+            gemini_concurrency = int(os.getenv('GEMINI_CONCURRENCY', 2))
+        self.gemini_concurrency = max(1, gemini_concurrency)
+        # Per-batch pools are nested under /analyze/batch's candidate pool, so the
+        # in-flight cap has to be shared by every thread calling Gemini
+        self._in_flight = threading.BoundedSemaphore(self.gemini_concurrency)
+        # Posts per Gemini request; amortizes round-trips and rubric tokens
+        self.batch_size = max(1, int(os.getenv('GEMINI_BATCH_SIZE', 20)))
+
+        # Pace requests to the per-minute quota instead of waiting for 429s; the limit is
+        # per process, so multi-worker deployments divide the quota by the worker count
+        self._rate_limiter = RateLimiter(float(os.getenv('GEMINI_RPM', 15)))
+        self.max_retries = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+        self.retry_base_delay = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 1.0))
+
+        # Re-scrapes and retweets replay identical posts; don't pay Gemini twice
+        self.response_cache = LLMCache(
+            max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000)),
+            default_ttl=float(os.getenv('LLM_CACHE_TTL', 86400))
+        )
+
+        # Second tier for paraphrased/templated posts; costs one embedding call per miss
+        self.semantic_cache = None
+        if os.getenv('SEMANTIC_CACHE_ENABLED') == 'true':
+            self.semantic_cache = SemanticCache(
+                threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92)),
+                max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 5000)),
+                path=os.getenv('SEMANTIC_CACHE_PATH')
+            )
+            atexit.register(self.semantic_cache.save)
 
         self.risk_categories = {
             'personal_attacks': {
@@ -69,6 +451,31 @@ class SocialMediaAnalyzer:
             }
         }
 
+        # Column layout used to vectorize the weighted score
+        self._category_index = {category: column for column, category in enumerate(self.risk_categories)}
+        self._category_weights = np.array(
+            [config['weight'] for config in self.risk_categories.values()], dtype=np.float64
+        )
+
+        # Short, keyword-free, non-shouting posts skip Gemini entirely
+        self.prefilter_max_length = int(os.getenv('PREFILTER_MAX_LENGTH', 40))
+        self.prefilter_max_uppercase_ratio = float(os.getenv('PREFILTER_MAX_UPPERCASE_RATIO', 0.3))
+        self._prefilter_lock = threading.Lock()
+        self.prefilter_checked = 0
+        self.prefilter_skipped = 0
+
+        # One compiled alternation scans the text once for every fallback keyword.
+        # The zero-width lookahead tries a match at every position, so overlapping
+        # keywords ("stupidisgusting") are all found, like the substring checks
+        self._keyword_categories = {
+            word: category
+            for category, words in _FALLBACK_KEYWORDS.items()
+            for word in words
+        }
+        self._keyword_pattern = re.compile('(?=(' + '|'.join(
+            re.escape(word) for word in sorted(self._keyword_categories, key=len, reverse=True)
+        ) + '))')
+
     def convert_scraper_json_to_content_items(self, scraper_json: dict) -> List[ContentItem]:
         """Convert scraper JSON to ContentItem objects"""
         content_items = []
@@ -82,17 +489,19 @@ class SocialMediaAnalyzer:
             try:
                 # Convert timestamp
                 if 'timestamp' in post:
-                    timestamp = datetime.fromtimestamp(post['timestamp'] / 1000)
+                    timestamp = datetime.fromtimestamp(post['timestamp'] * _MS_TO_SECONDS)
                 elif 'date' in post:
-                    timestamp = datetime.fromisoformat(post['date'].replace('Z', '+00:00'))
+                    # Python 3.11+ parses a trailing 'Z' natively
+                    timestamp = datetime.fromisoformat(post['date'])
                 else:
                     timestamp = datetime.now()
 
-                post_type = self._determine_post_type(post)
+                text = post.get('text', '')
+                post_type = self._determine_post_type(text.lower(), post.get('platform', '').lower())
                 engagement = post.get('stats', {})
 
                 content_item = ContentItem(
-                    text=post.get('text', ''),
+                    text=text,
                     platform=post.get('platform', 'unknown'),
                     timestamp=timestamp,
                     post_type=post_type,
@@ -107,25 +516,26 @@ class SocialMediaAnalyzer:
 
         return content_items
 
-    def _determine_post_type(self, post: dict) -> str:
-        """Determine post type from content"""
-        text = post.get('text', '').lower()
-        platform = post.get('platform', '').lower()
-
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _determine_post_type(text_lower: str, platform: str) -> str:
+        """Determine post type from lowercased content; cached for repeated posts"""
         if platform == 'twitter':
-            if text.startswith('rt @') or 'retweeted' in text.lower():
+            if text_lower.startswith('rt @') or 'retweeted' in text_lower:
                 return 'retweet'
 
-        if text.startswith('@') or text.startswith('replying to'):
+        if text_lower.startswith('@') or text_lower.startswith('replying to'):
             return 'reply'
 
-        if 'quoted' in text.lower() or 'shared' in text.lower():
+        if 'quoted' in text_lower or 'shared' in text_lower:
             return 'quote'
 
         return 'original'
 
-    def analyze_scraper_data(self, scraper_json: dict, candidate_name: str = "Unknown") -> Dict:
-        """Main analysis method"""
+    def analyze_scraper_data(self, scraper_json: dict, candidate_name: str = "Unknown",
+                             analysis_timestamp: Optional[str] = None) -> Dict:
+        """Main analysis method; analysis_timestamp lets a request stamp all its reports once"""
+        analysis_timestamp = analysis_timestamp or datetime.now().isoformat()
         try:
             content_items = self.convert_scraper_json_to_content_items(scraper_json)
 
@@ -133,20 +543,14 @@ class SocialMediaAnalyzer:
                 return {
                     'error': 'No content items found in scraper data',
                     'candidate': candidate_name,
-                    'analysis_timestamp': datetime.now().isoformat()
+                    'analysis_timestamp': analysis_timestamp
                 }
 
-            analysis_results = self.analyze_content_batch(content_items)
+            analysis_results = self.analyze_content_batch(content_items, analysis_timestamp)
             report = self.generate_report(analysis_results, candidate_name)
 
             # Add scraper metadata
-            report['scraper_metadata'] = {
-                'platform': scraper_json.get('data', {}).get('platform', 'unknown'),
-                'target_user': scraper_json.get('data', {}).get('targetUser', 'unknown'),
-                'timeframe': scraper_json.get('data', {}).get('timeframe', 'unknown'),
-                'total_posts_scraped': scraper_json.get('data', {}).get('totalPosts', 0),
-                'scraped_at': scraper_json.get('data', {}).get('scrapedAt', 'unknown')
-            }
+            report['scraper_metadata'] = self._scraper_metadata(scraper_json)
 
             return report
 
@@ -154,93 +558,292 @@ class SocialMediaAnalyzer:
             return {
                 'error': f'Analysis failed: {str(e)}',
                 'candidate': candidate_name,
-                'analysis_timestamp': datetime.now().isoformat()
+                'analysis_timestamp': analysis_timestamp
             }
 
-    def analyze_content_batch(self, content_items: List[ContentItem]) -> Dict:
+    def stream_scraper_data(self, scraper_json: dict, candidate_name: str = "Unknown",
+                            analysis_timestamp: Optional[str] = None) -> Iterator[Dict]:
+        """Incremental analyze_scraper_data: one record per post as its batch completes,
+        then a summary record carrying the report without individual_posts"""
+        analysis_timestamp = analysis_timestamp or datetime.now().isoformat()
+        try:
+            content_items = self.convert_scraper_json_to_content_items(scraper_json)
+
+            if not content_items:
+                yield {
+                    'type': 'error',
+                    'error': 'No content items found in scraper data',
+                    'candidate': candidate_name,
+                    'analysis_timestamp': analysis_timestamp
+                }
+                return
+
+            individual_results = [None] * len(content_items)
+            for start, chunk_results in self.iter_content_batch(content_items):
+                individual_results[start:start + len(chunk_results)] = chunk_results
+                for result in chunk_results:
+                    yield {'type': 'post', **self._post_record(result)}
+
+            analysis_results = self._summarize_results(individual_results, content_items, analysis_timestamp)
+            report = self.generate_report(analysis_results, candidate_name, include_posts=False)
+            report['scraper_metadata'] = self._scraper_metadata(scraper_json)
+            yield {'type': 'summary', **report}
+
+        except Exception as e:
+            yield {
+                'type': 'error',
+                'error': f'Analysis failed: {str(e)}',
+                'candidate': candidate_name,
+                'analysis_timestamp': analysis_timestamp
+            }
+
+    def _scraper_metadata(self, scraper_json: dict) -> Dict:
+        return {
+            'platform': scraper_json.get('data', {}).get('platform', 'unknown'),
+            'target_user': scraper_json.get('data', {}).get('targetUser', 'unknown'),
+            'timeframe': scraper_json.get('data', {}).get('timeframe', 'unknown'),
+            'total_posts_scraped': scraper_json.get('data', {}).get('totalPosts', 0),
+            'scraped_at': scraper_json.get('data', {}).get('scrapedAt', 'unknown')
+        }
+
+    def iter_content_batch(self, content_items: List[ContentItem]) -> Iterator[Tuple[int, List[AnalysisResult]]]:
+        """Yield (start index, results) for each Gemini chunk in completion order"""
+        # Each chunk is an independent, network-bound Gemini call
+        executor = ThreadPoolExecutor(max_workers=self.gemini_concurrency)
+        completed = False
+        try:
+            futures = {
+                executor.submit(
+                    self._analyze_batch,
+                    content_items[start:start + self.batch_size],
+                    [f"item_{i}" for i in range(start, min(start + self.batch_size, len(content_items)))]
+                ): start
+                for start in range(0, len(content_items), self.batch_size)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+            completed = True
+        finally:
+            # If the consumer stopped early (e.g. a streaming client disconnected),
+            # drop queued chunks rather than spending Gemini quota on them
+            executor.shutdown(wait=completed, cancel_futures=not completed)
+
+    def analyze_content_batch(self, content_items: List[ContentItem],
+                              analysis_timestamp: Optional[str] = None) -> Dict:
         """Analyze batch of content items"""
-        individual_results = []
+        # Chunks finish out of order; slot them back by start index
+        individual_results = [None] * len(content_items)
+        for start, chunk_results in self.iter_content_batch(content_items):
+            individual_results[start:start + len(chunk_results)] = chunk_results
 
-        for i, item in enumerate(content_items):
-            result = self._analyze_single_item(item, f"item_{i}")
-            individual_results.append(result)
+        return self._summarize_results(
+            individual_results, content_items, analysis_timestamp or datetime.now().isoformat()
+        )
 
-        overall_score = self._calculate_overall_score(individual_results)
-        pattern_analysis = self._analyze_patterns(individual_results, content_items)
+    def _summarize_results(self, individual_results: List[AnalysisResult], content_items: List[ContentItem],
+                           analysis_timestamp: str) -> Dict:
+        """Aggregate per-post results into scores, patterns and a recommendation"""
+        risk_scores = np.fromiter(
+            (r.risk_score for r in individual_results),
+            dtype=np.float64, count=len(individual_results)
+        )
+        overall_score = self._calculate_overall_score(individual_results, risk_scores)
+        pattern_analysis = self._analyze_patterns(individual_results, content_items, risk_scores)
 
         return {
             'individual_results': individual_results,
             'overall_score': overall_score,
             'pattern_analysis': pattern_analysis,
             'recommendation': self._generate_recommendation(overall_score, pattern_analysis),
-            'analysis_timestamp': datetime.now().isoformat()
+            'analysis_timestamp': analysis_timestamp
         }
 
-    def _analyze_single_item(self, content: ContentItem, content_id: str) -> AnalysisResult:
-        """Analyze single content item using Gemini"""
-        prompt = f"""
-        Analyze this social media content for workplace-relevant behavioral concerns:
-
-        Content: "{content.text}"
-        Platform: {content.platform}
-        Post Type: {content.post_type}
-        Engagement: {content.engagement if content.engagement else 'None'}
-
-        Evaluate for these categories:
-        1. Personal attacks on individuals
-        2. Harassment patterns
-        3. Hate speech toward groups
-        4. Spreading disinformation
-        5. Excessive negativity
-
-        Consider context, sarcasm, cultural communication styles, and whether this is a response to provocation.
-
-        Respond in JSON format:
-        {{
-            "risk_level": "low|moderate|high|critical",
-            "categories": ["list of applicable categories"],
-            "confidence_score": 0.0-1.0,
-            "reasoning": "detailed explanation",
-            "red_flags": ["specific concerning elements"],
-            "context_notes": "context considered"
-        }}
-        """
+    def _prefilter(self, content: ContentItem, content_id: str) -> Optional[AnalysisResult]:
+        """Return a low-risk result for obviously benign posts, None if Gemini is needed"""
+        text = content.text
+        is_benign = (
+            len(text) < self.prefilter_max_length
+            and self._keyword_pattern.search(text.lower()) is None
+            and sum(1 for c in text if c.isupper()) / max(len(text), 1) < self.prefilter_max_uppercase_ratio
+        )
+
+        with self._prefilter_lock:
+            self.prefilter_checked += 1
+            if is_benign:
+                self.prefilter_skipped += 1
+
+        if not is_benign:
+            return None
+
+        return AnalysisResult(
+            content_id=content_id,
+            risk_level=RiskLevel.LOW.value,
+            categories=[],
+            confidence_score=0.6,
+            reasoning="Short post with no concerning keywords; skipped model analysis (pre-filter)",
+            red_flags=[]
+        )
+
+    def prefilter_stats(self) -> Dict:
+        with self._prefilter_lock:
+            return {
+                'checked': self.prefilter_checked,
+                'skipped': self.prefilter_skipped,
+                'skip_rate': self.prefilter_skipped / self.prefilter_checked if self.prefilter_checked else 0
+            }
+
+    def _analyze_uncached(self, content: ContentItem, content_id: str, cache_key: str,
+                          embedding: Optional[List[float]]) -> AnalysisResult:
+        """Send one post to Gemini and cache the parsed analysis"""
+        # Static rubric first so every request shares an identical prompt prefix
+        prompt = _ANALYSIS_RUBRIC + self._format_content(content)
 
         try:
-            response = self.model.generate_content(prompt)
+            # The response schema guarantees a bare JSON object
+            response = self._generate_content(prompt, _ANALYSIS_CONFIG)
+            result = self._build_result(content_id, orjson.loads(response.text))
+            self._store_result(cache_key, embedding, result)
+            return result
 
-            # Clean the response text to extract JSON
-            response_text = response.text.strip()
+        except Exception as e:
+            return self._fallback_analysis(content, content_id, str(e))
 
-            # Find JSON boundaries
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+    def _analyze_batch(self, items: List[ContentItem], ids: List[str]) -> List[AnalysisResult]:
+        """Analyze several posts with one Gemini request, falling back to per-item calls"""
+        results: List[Optional[AnalysisResult]] = [None] * len(items)
+        exact_misses = []
 
-            if start_idx != -1 and end_idx > start_idx:
-                json_text = response_text[start_idx:end_idx]
-                analysis_data = json.loads(json_text)
+        for i, (item, content_id) in enumerate(zip(items, ids)):
+            prefiltered = self._prefilter(item, content_id)
+            if prefiltered is not None:
+                results[i] = prefiltered
+                continue
+
+            cache_key = LLMCache.make_key(item)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                results[i] = replace(cached, content_id=content_id)
             else:
-                # Fallback if no JSON found
-                analysis_data = {
-                    "risk_level": "low",
-                    "categories": [],
-                    "confidence_score": 0.1,
-                    "reasoning": f"Failed to parse Gemini response: {response_text}",
-                    "red_flags": [],
-                    "context_notes": "Parsing error occurred"
-                }
+                exact_misses.append((i, cache_key))
 
-            return AnalysisResult(
-                content_id=content_id,
-                risk_level=RiskLevel(analysis_data['risk_level']),
-                categories=analysis_data['categories'],
-                confidence_score=analysis_data['confidence_score'],
-                reasoning=analysis_data['reasoning'],
-                red_flags=analysis_data['red_flags']
+        # Semantic tier: one embedding request for every exact-cache miss in the chunk
+        if self.semantic_cache and exact_misses:
+            embeddings = self._embed_many([items[i].text for i, _ in exact_misses])
+        else:
+            embeddings = [None] * len(exact_misses)
+
+        pending = []
+        for (i, cache_key), embedding in zip(exact_misses, embeddings):
+            if embedding is not None:
+                similar = self.semantic_cache.lookup(embedding)
+                if similar is not None:
+                    results[i] = replace(similar, content_id=ids[i])
+                    continue
+            pending.append((i, cache_key, embedding))
+
+        if len(pending) == 1:
+            i, cache_key, embedding = pending[0]
+            results[i] = self._analyze_uncached(items[i], ids[i], cache_key, embedding)
+        elif pending:
+            posts = ''.join(
+                f"\n[{number}]{self._format_content(items[i])}"
+                for number, (i, _, _) in enumerate(pending, start=1)
             )
+            prompt = _ANALYSIS_RUBRIC + _BATCH_INSTRUCTIONS.format(count=len(pending)) + posts
+
+            try:
+                response = self._generate_content(prompt, _BATCH_CONFIG)
+                analysis_data = orjson.loads(response.text)
+                if len(analysis_data['results']) != len(pending):
+                    raise ValueError(f"expected {len(pending)} results, got {len(analysis_data['results'])}")
+
+                # Length check above plus a full id set rules out duplicate ids
+                entries = {int(entry['id']): entry for entry in analysis_data['results']}
+                if sorted(entries) != list(range(1, len(pending) + 1)):
+                    raise ValueError(f"expected ids 1..{len(pending)}, got ids {sorted(entries)}")
+
+                batch_results = [
+                    self._build_result(ids[i], entries[number])
+                    for number, (i, _, _) in enumerate(pending, start=1)
+                ]
+                for (i, cache_key, embedding), result in zip(pending, batch_results):
+                    self._store_result(cache_key, embedding, result)
+                    results[i] = result
+
+            except (orjson.JSONDecodeError, ValueError, KeyError, TypeError) as e:
+                # Malformed or mismatched reply; single-post prompts may still parse
+                print(f"Warning: Batched analysis reply was invalid, retrying {len(pending)} posts individually: {e}")
+                for i, cache_key, embedding in pending:
+                    results[i] = self._analyze_uncached(items[i], ids[i], cache_key, embedding)
+
+            except Exception as e:
+                # API failures (quota spent after _generate_content's retries, bad key,
+                # outage) would repeat for every per-post call, each one rate-limited
+                print(f"Warning: Gemini request failed, using keyword fallback for {len(pending)} posts: {e}")
+                for i, _, _ in pending:
+                    results[i] = self._fallback_analysis(items[i], ids[i], str(e))
+
+        return results
+
+    def _format_content(self, content: ContentItem) -> str:
+        """Per-post section appended after the shared rubric"""
+        return _CONTENT_TEMPLATE.format_map({
+            'text': content.text,
+            'platform': content.platform,
+            'post_type': content.post_type,
+            'engagement': json.dumps(content.engagement, separators=(',', ':'), default=str)
+            if content.engagement else 'None'
+        })
+
+    def _build_result(self, content_id: str, analysis_data: Dict) -> AnalysisResult:
+        risk_level = analysis_data['risk_level']
+        if risk_level not in _RISK_SCORES:
+            raise ValueError(f"{risk_level!r} is not a valid RiskLevel")
+
+        return AnalysisResult(
+            content_id=content_id,
+            risk_level=risk_level,
+            categories=analysis_data['categories'],
+            confidence_score=analysis_data['confidence_score'],
+            reasoning=analysis_data['reasoning'],
+            red_flags=analysis_data['red_flags']
+        )
+
+    def _store_result(self, cache_key: str, embedding: Optional[List[float]], result: AnalysisResult):
+        self.response_cache.set(cache_key, result)
+        if embedding is not None:
+            self.semantic_cache.add(embedding, result)
 
+    def _embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed post texts for the semantic cache in one request; None skips the lookup"""
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        positions = [position for position, text in enumerate(texts) if text.strip()]
+        if not positions:
+            return embeddings
+
+        try:
+            response = genai.embed_content(
+                model='models/text-embedding-004',
+                content=[texts[position] for position in positions]
+            )
         except Exception as e:
-            return self._fallback_analysis(content, content_id, str(e))
+            print(f"Warning: Embedding failed, skipping semantic cache: {e}")
+            return embeddings
+
+        for position, embedding in zip(positions, response['embedding']):
+            embeddings[position] = embedding
+        return embeddings
+
+    def _generate_content(self, prompt: str, generation_config: genai.GenerationConfig):
+        """Call Gemini within the rate limit, backing off only on quota errors"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._in_flight, self._rate_limiter:
+                    return self.model.generate_content(prompt, generation_config=generation_config)
+            except google_exceptions.ResourceExhausted:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.retry_base_delay * (2 ** attempt))
 
     def _fallback_analysis(self, content: ContentItem, content_id: str, error: str) -> AnalysisResult:
         """Fallback keyword analysis"""
@@ -248,20 +851,23 @@ class SocialMediaAnalyzer:
 
         red_flags = []
         categories = []
-        risk_level = RiskLevel.LOW
+        risk_level = RiskLevel.LOW.value
 
-        personal_attack_keywords = ['idiot', 'stupid', 'moron', 'loser', 'pathetic']
-        hate_keywords = ['hate', 'disgusting', 'should die', 'kill yourself']
+        found_categories = set()
+        for match in self._keyword_pattern.finditer(text_lower):
+            found_categories.add(self._keyword_categories[match.group(1)])
+            if len(found_categories) == len(_FALLBACK_KEYWORDS):
+                break
 
-        if any(word in text_lower for word in personal_attack_keywords):
+        if 'personal_attacks' in found_categories:
             categories.append('personal_attacks')
             red_flags.append('Personal attack keywords detected')
-            risk_level = RiskLevel.MODERATE
+            risk_level = RiskLevel.MODERATE.value
 
-        if any(word in text_lower for word in hate_keywords):
+        if 'hate_speech' in found_categories:
             categories.append('hate_speech')
             red_flags.append('Hate speech keywords detected')
-            risk_level = RiskLevel.HIGH
+            risk_level = RiskLevel.HIGH.value
 
         return AnalysisResult(
             content_id=content_id,
@@ -272,29 +878,30 @@ class SocialMediaAnalyzer:
             red_flags=red_flags
         )
 
-    def _calculate_overall_score(self, results: List[AnalysisResult]) -> Dict:
+    def _calculate_overall_score(self, results: List[AnalysisResult], risk_scores: np.ndarray) -> Dict:
         """Calculate weighted overall risk score"""
         if not results:
             return {'score': 0, 'risk_level': 'low'}
 
-        total_weighted_score = 0
-        total_weight = 0
-        category_counts = {}
-        high_risk_count = 0
-
-        for result in results:
-            if result.risk_level in [RiskLevel.HIGH, RiskLevel.CRITICAL]:
-                high_risk_count += 1
-
+        # Structure-of-arrays view: per-post confidences plus an (N, K) matrix
+        # counting how often each weighted category was flagged on each post
+        confidences = np.fromiter((r.confidence_score for r in results), dtype=np.float64, count=len(results))
+        category_hits = np.zeros((len(results), len(self._category_index)), dtype=np.float64)
+        for row, result in enumerate(results):
             for category in result.categories:
-                if category in self.risk_categories:
-                    weight = self.risk_categories[category]['weight']
-                    risk_score = self._risk_level_to_score(result.risk_level)
-
-                    total_weighted_score += (risk_score * weight * result.confidence_score)
-                    total_weight += weight
-
-                    category_counts[category] = category_counts.get(category, 0) + 1
+                column = self._category_index.get(category)
+                if column is not None:
+                    category_hits[row, column] += 1
+
+        per_post_weight = category_hits @ self._category_weights
+        total_weighted_score = float((risk_scores * confidences) @ per_post_weight)
+        total_weight = float(per_post_weight.sum())
+        high_risk_count = int((risk_scores >= self._risk_level_to_score(RiskLevel.HIGH.value)).sum())
+        category_counts = {
+            category: int(count)
+            for category, count in zip(self._category_index, category_hits.sum(axis=0))
+            if count
+        }
 
         final_score = (total_weighted_score / max(total_weight, 1)) * 100
         pattern_multiplier = min(1.5, 1 + (high_risk_count / len(results)))
@@ -308,7 +915,8 @@ class SocialMediaAnalyzer:
             'total_posts_analyzed': len(results)
         }
 
-    def _analyze_patterns(self, results: List[AnalysisResult], content_items: List[ContentItem]) -> Dict:
+    def _analyze_patterns(self, results: List[AnalysisResult], content_items: List[ContentItem],
+                          risk_scores: np.ndarray) -> Dict:
         """Analyze behavioral patterns"""
         timestamps = [item.timestamp for item in content_items]
         date_range = (min(timestamps), max(timestamps)) if timestamps else (None, None)
@@ -316,21 +924,19 @@ class SocialMediaAnalyzer:
         risk_levels = [result.risk_level for result in results]
         consistent_risk = len(set(risk_levels)) <= 2
 
-        platform_analysis = {}
-        for item, result in zip(content_items, results):
-            platform = item.platform
-            if platform not in platform_analysis:
-                platform_analysis[platform] = []
-            platform_analysis[platform].append(result.risk_level)
-
+        # Single pass: first-seen platform codes for bincount plus post type tallies
+        platform_index = {}
+        platform_codes = []
         post_type_analysis = {}
         for item, result in zip(content_items, results):
-            post_type = item.post_type
-            if post_type not in post_type_analysis:
-                post_type_analysis[post_type] = {'count': 0, 'high_risk': 0}
-            post_type_analysis[post_type]['count'] += 1
-            if result.risk_level in [RiskLevel.HIGH, RiskLevel.CRITICAL]:
-                post_type_analysis[post_type]['high_risk'] += 1
+            platform_codes.append(platform_index.setdefault(item.platform, len(platform_index)))
+            counts = post_type_analysis.setdefault(item.post_type, {'count': 0, 'high_risk': 0})
+            counts['count'] += 1
+            counts['high_risk'] += result.risk_level in _HIGH_RISK
+
+        platform_codes = np.asarray(platform_codes, dtype=np.intp)
+        platform_counts = np.bincount(platform_codes, minlength=len(platform_index))
+        platform_risk_totals = np.bincount(platform_codes, weights=risk_scores, minlength=len(platform_index))
 
         return {
             'date_range': {
@@ -340,13 +946,13 @@ class SocialMediaAnalyzer:
             },
             'consistency': {
                 'consistent_behavior': consistent_risk,
-                'risk_level_variety': list(set([r.value for r in risk_levels]))
+                'risk_level_variety': list(set(risk_levels))
             },
             'platform_differences': {
                 platform: {
-                    'avg_risk': sum(self._risk_level_to_score(r) for r in risks) / len(risks),
-                    'post_count': len(risks)
-                } for platform, risks in platform_analysis.items()
+                    'avg_risk': float(platform_risk_totals[code] / platform_counts[code]),
+                    'post_count': int(platform_counts[code])
+                } for platform, code in platform_index.items()
             },
             'post_type_patterns': {
                 post_type: {
@@ -411,15 +1017,9 @@ class SocialMediaAnalyzer:
         }
         return actions.get(recommendation, [])
 
-    def _risk_level_to_score(self, risk_level: RiskLevel) -> float:
-        """Convert risk level to numeric score"""
-        mapping = {
-            RiskLevel.LOW: 0.1,
-            RiskLevel.MODERATE: 0.4,
-            RiskLevel.HIGH: 0.7,
-            RiskLevel.CRITICAL: 1.0
-        }
-        return mapping.get(risk_level, 0.1)
+    def _risk_level_to_score(self, risk_level: str) -> float:
+        """Convert risk level value to numeric score"""
+        return _RISK_SCORES.get(risk_level, 0.1)
 
     def _score_to_risk_level(self, score: float) -> str:
         """Convert numeric score to risk level"""
@@ -432,9 +1032,19 @@ class SocialMediaAnalyzer:
         else:
             return 'low'
 
-    def generate_report(self, analysis_results: Dict, candidate_name: str) -> Dict:
-        """Generate comprehensive analysis report"""
+    def _post_record(self, result: AnalysisResult) -> Dict:
         return {
+            'content_id': result.content_id,
+            'risk_level': result.risk_level,
+            'categories': result.categories,
+            'confidence': result.confidence_score,
+            'red_flags': result.red_flags,
+            'reasoning': result.reasoning
+        }
+
+    def generate_report(self, analysis_results: Dict, candidate_name: str, include_posts: bool = True) -> Dict:
+        """Generate comprehensive analysis report"""
+        report = {
             'candidate': candidate_name,
             'analysis_summary': {
                 'overall_score': analysis_results['overall_score']['score'],
@@ -447,16 +1057,6 @@ class SocialMediaAnalyzer:
                 'pattern_analysis': analysis_results['pattern_analysis'],
                 'high_risk_ratio': analysis_results['overall_score']['high_risk_post_ratio']
             },
-            'individual_posts': [
-                {
-                    'content_id': result.content_id,
-                    'risk_level': result.risk_level.value,
-                    'categories': result.categories,
-                    'confidence': result.confidence_score,
-                    'red_flags': result.red_flags,
-                    'reasoning': result.reasoning
-                } for result in analysis_results['individual_results']
-            ],
             'recommendations': {
                 'hiring_decision': analysis_results['recommendation']['recommendation'],
                 'reasoning': analysis_results['recommendation']['reason'],
@@ -465,18 +1065,38 @@ class SocialMediaAnalyzer:
             },
             'metadata': {
                 'analysis_timestamp': analysis_results['analysis_timestamp'],
-                'model_version': 'gemini-pro',
+                'model_version': MODEL_VERSION,
                 'confidence_threshold': 0.6
             }
         }
 
+        if include_posts:
+            report['individual_posts'] = [
+                self._post_record(result) for result in analysis_results['individual_results']
+            ]
+
+        return report
+
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes responses and parses requests with orjson"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Flask Application
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Initialize analyzer
@@ -486,6 +1106,9 @@ if not GEMINI_API_KEY:
 
 analyzer = SocialMediaAnalyzer(GEMINI_API_KEY) if GEMINI_API_KEY else None
 
+# Candidates analyzed concurrently by /analyze/batch
+BATCH_CANDIDATE_CONCURRENCY = max(1, int(os.getenv('BATCH_CANDIDATE_CONCURRENCY', 8)))
+
 @app.route('/', methods=['GET'])
 def index():
     """Root endpoint with service information"""
@@ -509,6 +1132,9 @@ def health_check():
         'status': 'healthy',
         'service': 'social-media-analysis',
         'gemini_configured': GEMINI_API_KEY is not None,
+        'response_cache': analyzer.response_cache.stats() if analyzer else None,
+        'semantic_cache': analyzer.semantic_cache.stats() if analyzer and analyzer.semantic_cache else None,
+        'prefilter': analyzer.prefilter_stats() if analyzer else None,
         'timestamp': datetime.now().isoformat()
     })
 
@@ -539,8 +1165,11 @@ def analyze_endpoint():
                 'error': 'Missing scraper_json in request'
             }), 400
 
+        if options.get('stream'):
+            return _stream_analysis(scraper_json, candidate_name, options, start_time)
+
         # Perform analysis
-        results = analyzer.analyze_scraper_data(scraper_json, candidate_name)
+        results = analyzer.analyze_scraper_data(scraper_json, candidate_name, datetime.now().isoformat())
 
         # Add processing metadata
         processing_time = time.time() - start_time
@@ -566,6 +1195,47 @@ def analyze_endpoint():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def _stream_analysis(scraper_json: dict, candidate_name: str, options: Dict, start_time: float) -> Response:
+    """NDJSON response: one line per analysed post, then a summary (or error) line"""
+    def generate():
+        for record in analyzer.stream_scraper_data(scraper_json, candidate_name, datetime.now().isoformat()):
+            if record['type'] != 'post':
+                record['processing_metadata'] = {
+                    'processing_time_seconds': round(time.time() - start_time, 2),
+                    'analysis_options': options,
+                    'service_version': '1.0.0'
+                }
+            yield orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _analyze_candidate(candidate: dict, analysis_timestamp: str) -> Dict:
+    """Analyze one entry of a batch request"""
+    try:
+        scraper_json = candidate.get('scraper_json')
+        candidate_name = candidate.get('candidate_name', 'Unknown')
+
+        if scraper_json:
+            analysis = analyzer.analyze_scraper_data(scraper_json, candidate_name, analysis_timestamp)
+            return {
+                'candidate_name': candidate_name,
+                'analysis': analysis,
+                'status': 'completed'
+            }
+
+        return {
+            'candidate_name': candidate_name,
+            'error': 'Missing scraper_json',
+            'status': 'failed'
+        }
+
+    except Exception as e:
+        return {
+            'candidate_name': candidate.get('candidate_name', 'Unknown'),
+            'error': str(e),
+            'status': 'failed'
+        }
+
 @app.route('/analyze/batch', methods=['POST'])
 def batch_analyze_endpoint():
     """Batch analysis endpoint for multiple candidates"""
@@ -585,33 +1255,19 @@ def batch_analyze_endpoint():
                 'error': 'No candidates provided for batch analysis'
             }), 400
 
-        results = []
-
-        for candidate in candidates:
-            try:
-                scraper_json = candidate.get('scraper_json')
-                candidate_name = candidate.get('candidate_name', 'Unknown')
-
-                if scraper_json:
-                    analysis = analyzer.analyze_scraper_data(scraper_json, candidate_name)
-                    results.append({
-                        'candidate_name': candidate_name,
-                        'analysis': analysis,
-                        'status': 'completed'
-                    })
-                else:
-                    results.append({
-                        'candidate_name': candidate_name,
-                        'error': 'Missing scraper_json',
-                        'status': 'failed'
-                    })
+        # One timestamp stamps every candidate's report and the batch response
+        now_iso = datetime.now().isoformat()
 
-            except Exception as e:
-                results.append({
-                    'candidate_name': candidate.get('candidate_name', 'Unknown'),
-                    'error': str(e),
-                    'status': 'failed'
-                })
+        # Candidates are independent; Gemini load is still bounded by the
+        # analyzer's shared rate limiter. Results keep request order.
+        results = [None] * len(candidates)
+        with ThreadPoolExecutor(max_workers=min(len(candidates), BATCH_CANDIDATE_CONCURRENCY)) as executor:
+            futures = {
+                executor.submit(_analyze_candidate, candidate, now_iso): position
+                for position, candidate in enumerate(candidates)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
 
         processing_time = time.time() - start_time
 
@@ -621,7 +1277,7 @@ def batch_analyze_endpoint():
             'successful_analyses': len([r for r in results if r['status'] == 'completed']),
             'failed_analyses': len([r for r in results if r['status'] == 'failed']),
             'processing_time_seconds': round(processing_time, 2),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now_iso
         })
 
     except Exception as e:
@@ -680,6 +1336,8 @@ services:
       - GEMINI_API_KEY=${GEMINI_API_KEY}
       - FLASK_ENV=production
       - PORT=5000
+      # The rate limiter is per process: split the 15 RPM quota across the 2 gunicorn workers
+      - GEMINI_RPM=7
     volumes:
       - ./analysis-service:/app
     restart: unless-stopped
@@ -716,6 +1374,6 @@ EXPOSE 5000
 HEALTHCHECK --interval=30s --timeout=30s --start-period=5s --retries=3 \
     CMD curl -f http://localhost:5000/health || exit 1
 
-# Start the application
-CMD ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "--timeout", "120", "analysis_service:app"]
+# Start the application; gthread workers keep serving while requests wait on Gemini
+CMD ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "--worker-class", "gthread", "--threads", "16", "--timeout", "120", "analysis_service:app"]
 """
\ No newline at end of file
@@ -0,0 +1,462 @@
+import os
+import random
+import re
+import tempfile
+import time
+import unittest
+from dataclasses import replace
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import orjson
+from google.api_core import exceptions as google_exceptions
+
+import analysis_service
+from analysis_service import (
+    AnalysisResult, ContentItem, LLMCache, RateLimiter, SemanticCache, SocialMediaAnalyzer, _FALLBACK_KEYWORDS
+)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for GenerativeModel; reply(prompt, post_count) builds the response text"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        return FakeResponse(self.reply(prompt, len(re.findall(r'^\[\d+\]', prompt, re.M))))
+
+
+def analysis(**overrides):
+    data = {
+        'risk_level': 'moderate',
+        'categories': ['personal_attacks'],
+        'confidence_score': 0.8,
+        'reasoning': 'Model analysis',
+        'red_flags': ['insult']
+    }
+    data.update(overrides)
+    return data
+
+
+def batch_reply(ids):
+    return orjson.dumps({'results': [analysis(id=number) for number in ids]}).decode()
+
+
+def make_items(count):
+    # Long enough to get past the pre-filter, so every post reaches the model
+    return [
+        ContentItem(
+            text=f"Post number {i} with enough words to be worth a model call",
+            platform='twitter',
+            timestamp=datetime(2024, 1, 1, 12, i),
+            post_type='post'
+        )
+        for i in range(count)
+    ]
+
+
+def scraper_json(texts):
+    posts = [
+        {'text': text, 'platform': 'twitter', 'timestamp': 1700000000000 + i * 60000}
+        for i, text in enumerate(texts)
+    ]
+    return {'success': True, 'data': {'posts': posts, 'platform': 'twitter'}}
+
+
+def make_analyzer():
+    with mock.patch.dict(os.environ, {'GEMINI_RPM': '6000', 'SEMANTIC_CACHE_ENABLED': 'false'}):
+        analyzer = SocialMediaAnalyzer('test-key')
+    analyzer.retry_base_delay = 0
+    return analyzer
+
+
+# Baseline implementations, before keyword matching and scoring were rewritten
+def baseline_fallback(text):
+    text_lower = text.lower()
+    categories = []
+    risk_level = 'low'
+    if any(word in text_lower for word in _FALLBACK_KEYWORDS['personal_attacks']):
+        categories.append('personal_attacks')
+        risk_level = 'moderate'
+    if any(word in text_lower for word in _FALLBACK_KEYWORDS['hate_speech']):
+        categories.append('hate_speech')
+        risk_level = 'high'
+    return risk_level, categories
+
+
+def baseline_overall_score(analyzer, results):
+    total_weighted_score = 0
+    total_weight = 0
+    category_counts = {}
+    high_risk_count = 0
+
+    for result in results:
+        if result.risk_level in ['high', 'critical']:
+            high_risk_count += 1
+
+        for category in result.categories:
+            if category in analyzer.risk_categories:
+                weight = analyzer.risk_categories[category]['weight']
+                risk_score = analyzer._risk_level_to_score(result.risk_level)
+
+                total_weighted_score += (risk_score * weight * result.confidence_score)
+                total_weight += weight
+
+                category_counts[category] = category_counts.get(category, 0) + 1
+
+    final_score = (total_weighted_score / max(total_weight, 1)) * 100
+    final_score *= min(1.5, 1 + (high_risk_count / len(results)))
+
+    return {
+        'score': min(100, final_score),
+        'risk_level': analyzer._score_to_risk_level(final_score),
+        'category_breakdown': category_counts,
+        'high_risk_post_ratio': high_risk_count / len(results),
+        'total_posts_analyzed': len(results)
+    }
+
+
+class FakeClock:
+    """Replaces time.monotonic/time.sleep so pacing is checked without waiting"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple('analysis_service.time', monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_up_to_quota_then_paced(self):
+        limiter = RateLimiter(6)
+        for _ in range(6):
+            limiter.acquire()
+        self.assertEqual(self.clock.slept, [])
+
+        # Refill is 6 per minute, so each further call waits 10 seconds
+        limiter.acquire()
+        limiter.acquire()
+        self.assertAlmostEqual(sum(self.clock.slept), 20.0)
+        self.assertAlmostEqual(self.clock.now, 1020.0)
+
+    def test_idle_refill_is_capped_at_quota(self):
+        limiter = RateLimiter(6)
+        self.clock.now += 3600
+        for _ in range(6):
+            with limiter:
+                pass
+        self.assertEqual(self.clock.slept, [])
+
+        limiter.acquire()
+        self.assertAlmostEqual(sum(self.clock.slept), 10.0)
+
+
+class AnalyzeBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        self.items = make_items(3)
+        self.ids = ['item_0', 'item_1', 'item_2']
+
+    def test_good_reply_uses_one_request(self):
+        model = FakeModel(lambda prompt, count: batch_reply(range(1, count + 1)))
+        self.analyzer.model = model
+
+        results = self.analyzer._analyze_batch(self.items, self.ids)
+
+        self.assertEqual(len(model.prompts), 1)
+        self.assertEqual([r.content_id for r in results], self.ids)
+        self.assertTrue(all(r.reasoning == 'Model analysis' for r in results))
+
+    def test_missing_id_retries_each_post(self):
+        model = FakeModel(lambda prompt, count: batch_reply([1, 2]) if count else orjson.dumps(analysis()).decode())
+        self.analyzer.model = model
+
+        results = self.analyzer._analyze_batch(self.items, self.ids)
+
+        self.assertEqual(len(model.prompts), 1 + len(self.items))
+        self.assertEqual([r.content_id for r in results], self.ids)
+        self.assertTrue(all(r.reasoning == 'Model analysis' for r in results))
+
+    def test_duplicate_id_retries_each_post(self):
+        model = FakeModel(lambda prompt, count: batch_reply([1, 1, 2]) if count else orjson.dumps(analysis()).decode())
+        self.analyzer.model = model
+
+        results = self.analyzer._analyze_batch(self.items, self.ids)
+
+        self.assertEqual(len(model.prompts), 1 + len(self.items))
+        self.assertEqual([r.content_id for r in results], self.ids)
+        self.assertTrue(all(r.reasoning == 'Model analysis' for r in results))
+
+    def test_quota_exhausted_uses_keyword_fallback(self):
+        def reply(prompt, count):
+            raise google_exceptions.ResourceExhausted('quota')
+
+        model = FakeModel(reply)
+        self.analyzer.model = model
+
+        results = self.analyzer._analyze_batch(self.items, self.ids)
+
+        # Retries stay on the batched request; no per-post fan-out
+        self.assertEqual(len(model.prompts), self.analyzer.max_retries + 1)
+        self.assertEqual([r.content_id for r in results], self.ids)
+        self.assertTrue(all(r.confidence_score == 0.3 for r in results))
+        self.assertTrue(all(r.reasoning.startswith('Fallback analysis') for r in results))
+
+    def test_api_error_uses_keyword_fallback(self):
+        def reply(prompt, count):
+            raise google_exceptions.ServiceUnavailable('outage')
+
+        model = FakeModel(reply)
+        self.analyzer.model = model
+
+        results = self.analyzer._analyze_batch(self.items, self.ids)
+
+        self.assertEqual(len(model.prompts), 1)
+        self.assertEqual([r.content_id for r in results], self.ids)
+        self.assertTrue(all(r.reasoning.startswith('Fallback analysis') for r in results))
+
+
+class LLMCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('analysis_service.time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entries_expire_after_ttl(self):
+        cache = LLMCache(default_ttl=60)
+        cache.set('default', 'a')
+        cache.set('short', 'b', ttl=5)
+
+        self.clock.now += 10
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('default'), 'a')
+
+        self.clock.now += 60
+        self.assertIsNone(cache.get('default'))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LLMCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['hits'], 3)
+
+    def test_key_covers_every_prompt_input(self):
+        item = make_items(1)[0]
+        self.assertEqual(LLMCache.make_key(item), LLMCache.make_key(replace(item)))
+        self.assertNotEqual(LLMCache.make_key(item), LLMCache.make_key(replace(item, platform='reddit')))
+        self.assertNotEqual(LLMCache.make_key(item), LLMCache.make_key(replace(item, engagement={'likes': 1})))
+
+
+class SemanticCacheSaveTest(unittest.TestCase):
+    def add(self, cache, dimension, reasoning):
+        embedding = np.zeros(8)
+        embedding[dimension] = 1.0
+        cache.add(embedding, AnalysisResult('', 'low', [], 0.5, reasoning, []))
+
+    def test_workers_merge_into_one_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'semantic_cache.npz')
+            first = SemanticCache(max_entries=4, path=path)
+            second = SemanticCache(max_entries=4, path=path)
+            for i in range(3):
+                self.add(first, i, f"first_{i}")
+                self.add(second, 4 + i, f"second_{i}")
+
+            first.save()
+            second.save()
+            reloaded = SemanticCache(max_entries=4, path=path)
+
+            # Oldest entry dropped, the rest kept in insertion order
+            self.assertEqual(
+                [r.reasoning for r in reloaded._results[:reloaded._size]],
+                ['first_2', 'second_0', 'second_1', 'second_2']
+            )
+            self.assertEqual(reloaded.lookup(np.eye(8)[5]).reasoning, 'second_1')
+            self.assertIsNone(reloaded.lookup(np.eye(8)[0]))
+            self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp')])
+
+
+class FallbackAnalysisTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        self.rng = random.Random(1234)
+
+    def fallback(self, text):
+        return self.analyzer._fallback_analysis(ContentItem(text, 'twitter', datetime.now(), 'post'), 'id', 'e')
+
+    def test_overlapping_keywords_match_both_categories(self):
+        result = self.fallback('stupidisgusting')
+        self.assertEqual(result.categories, ['personal_attacks', 'hate_speech'])
+        self.assertEqual(result.risk_level, 'high')
+
+    def test_fallback_matches_baseline(self):
+        words = [w for keywords in _FALLBACK_KEYWORDS.values() for w in keywords]
+        pieces = words + [w.upper() for w in words] + ['', ' ', 'ok', 'stupidisgusting', 'kill your', 'self']
+        for _ in range(2000):
+            text = ''.join(self.rng.choice(pieces) for _ in range(self.rng.randint(0, 6)))
+            result = self.fallback(text)
+            self.assertEqual((result.risk_level, result.categories), baseline_fallback(text), text)
+
+
+class BatchEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        patcher = mock.patch.object(analysis_service, 'analyzer', self.analyzer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = analysis_service.app.test_client()
+
+    def test_results_keep_request_order(self):
+        def reply(prompt, count):
+            # The first candidate finishes last
+            if 'candidate zero' in prompt:
+                time.sleep(0.2)
+            return orjson.dumps(analysis()).decode()
+
+        self.analyzer.model = FakeModel(reply)
+        names = ['zero', 'one', 'missing', 'three']
+        candidates = [
+            {'candidate_name': name, 'scraper_json': scraper_json([f"A post written by candidate {name} about work"])}
+            for name in names
+        ]
+        del candidates[2]['scraper_json']
+
+        response = self.client.post('/analyze/batch', json={'candidates': candidates})
+
+        body = response.get_json()
+        self.assertEqual([r['candidate_name'] for r in body['batch_results']], names)
+        self.assertEqual([r['status'] for r in body['batch_results']], ['completed', 'completed', 'failed', 'completed'])
+        self.assertEqual((body['successful_analyses'], body['failed_analyses']), (3, 1))
+
+
+class StreamEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        self.analyzer.batch_size = 2
+        self.analyzer.model = FakeModel(
+            lambda prompt, count: batch_reply(range(1, count + 1)) if count else orjson.dumps(analysis()).decode()
+        )
+        patcher = mock.patch.object(analysis_service, 'analyzer', self.analyzer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = analysis_service.app.test_client()
+
+    def stream(self, scraper):
+        response = self.client.post('/analyze', json={
+            'scraper_json': scraper, 'candidate_name': 'Sam', 'options': {'stream': True}
+        })
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [orjson.loads(line) for line in response.data.splitlines()]
+
+    def test_post_records_then_summary(self):
+        records = self.stream(scraper_json([f"Post {i} long enough to be sent to the model" for i in range(5)]))
+
+        self.assertEqual([r['type'] for r in records], ['post'] * 5 + ['summary'])
+        self.assertEqual(sorted(r['content_id'] for r in records[:5]), [f"item_{i}" for i in range(5)])
+        self.assertTrue(all('processing_metadata' not in r for r in records[:5]))
+
+        summary = records[-1]
+        self.assertEqual(summary['candidate'], 'Sam')
+        self.assertEqual(summary['analysis_summary']['posts_analyzed'], 5)
+        self.assertNotIn('individual_posts', summary)
+        self.assertIn('processing_metadata', summary)
+
+    def test_failed_scrape_streams_one_error(self):
+        records = self.stream({'success': False, 'error': 'blocked'})
+
+        self.assertEqual([r['type'] for r in records], ['error'])
+        self.assertIn('blocked', records[0]['error'])
+
+
+class PrefilterTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+
+    def prefilter(self, text):
+        return self.analyzer._prefilter(ContentItem(text, 'twitter', datetime.now(), 'post'), 'item_0')
+
+    def test_short_benign_post_is_skipped(self):
+        result = self.prefilter('Great game last night everyone')
+        self.assertEqual((result.content_id, result.risk_level, result.categories), ('item_0', 'low', []))
+
+    def test_length_threshold(self):
+        self.assertIsNotNone(self.prefilter('a' * (self.analyzer.prefilter_max_length - 1)))
+        self.assertIsNone(self.prefilter('a' * self.analyzer.prefilter_max_length))
+
+    def test_keyword_goes_to_model(self):
+        self.assertIsNone(self.prefilter('what a LOSER'))
+        self.assertIsNone(self.prefilter('so stupid'))
+
+    def test_uppercase_ratio_threshold(self):
+        # 2 of 10 characters upper-case passes; 3 of 10 reaches the 0.3 ratio
+        self.assertIsNotNone(self.prefilter('ABcdefghij'))
+        self.assertIsNone(self.prefilter('ABCdefghij'))
+
+    def test_stats_count_checked_and_skipped(self):
+        self.prefilter('fine')
+        self.prefilter('you idiot')
+        self.assertEqual(self.analyzer.prefilter_stats(), {'checked': 2, 'skipped': 1, 'skip_rate': 0.5})
+
+
+class OverallScoreTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        self.rng = random.Random(1234)
+
+    def test_overall_score_matches_baseline(self):
+        levels = ['low', 'moderate', 'high', 'critical']
+        categories = list(self.analyzer.risk_categories) + ['unknown_category']
+        for _ in range(300):
+            results = [
+                AnalysisResult(
+                    content_id=f"item_{i}",
+                    risk_level=self.rng.choice(levels),
+                    categories=self.rng.choices(categories, k=self.rng.randint(0, 4)),
+                    confidence_score=self.rng.random(),
+                    reasoning='',
+                    red_flags=[]
+                )
+                for i in range(self.rng.randint(1, 40))
+            ]
+            risk_scores = np.array([r.risk_score for r in results], dtype=np.float64)
+
+            actual = self.analyzer._calculate_overall_score(results, risk_scores)
+            expected = baseline_overall_score(self.analyzer, results)
+
+            self.assertAlmostEqual(actual.pop('score'), expected.pop('score'), delta=1e-9)
+            self.assertAlmostEqual(actual.pop('high_risk_post_ratio'), expected.pop('high_risk_post_ratio'), delta=1e-9)
+            self.assertEqual(actual, expected)
+
+    def test_no_results_scores_zero(self):
+        self.assertEqual(self.analyzer._calculate_overall_score([], np.empty(0)), {'score': 0, 'risk_level': 'low'})
+
+
+if __name__ == '__main__':
+    unittest.main()